@@ -1,9 +1,23 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context
 from flask_mysqldb import MySQL
+import MySQLdb.cursors
 from werkzeug.security import generate_password_hash, check_password_hash
+from concurrent.futures import ThreadPoolExecutor, CancelledError, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
 from decimal import Decimal
+import bisect
+import click
+import csv
+import hashlib
+import io
+import json
+import math
 import os
+import queue
+import re
+import threading
+import zlib
+from time import monotonic
 
 app = Flask(__name__)
 app.secret_key = "your_secret_key" 
@@ -51,6 +65,523 @@ def staff_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Customer Search Index
+class CustomerSearchIndex:
+    """In-memory prefix index over customer names, phone digits and email for type-ahead lookup"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = []    # sorted list of (search key, CustomerID)
+        self._customers = {}  # CustomerID -> customer row
+        self._pending = {}    # CustomerID -> customer row (or None if removed) changed during the initial load
+        self._loaded = False
+        self._loading = False
+
+    @staticmethod
+    def _normalize(value):
+        return ' '.join((value or '').lower().split())
+
+    @staticmethod
+    def _digits(value):
+        return re.sub(r'\D', '', value or '')
+
+    def _keys_for(self, customer):
+        first = self._normalize(customer['FirstName'])
+        last = self._normalize(customer['LastName'])
+        keys = {first, last, f"{first} {last}", f"{last} {first}",
+                self._normalize(customer['Email']), self._digits(customer['Phone'])}
+        keys.discard('')
+        return keys
+
+    def load(self, cursor):
+        """Build the index from every Customer row; searches and updates are not blocked meanwhile"""
+        cursor.execute("SELECT CustomerID, FirstName, LastName, Phone, Email FROM Customer")
+        customers = {}
+        entries = []
+        for customer in cursor.fetchall():
+            customers[customer['CustomerID']] = customer
+            entries.extend((key, customer['CustomerID']) for key in self._keys_for(customer))
+        entries.sort()
+
+        with self._lock:
+            self._customers = customers
+            self._entries = entries
+            self._loaded = True
+            # Replay changes that may have missed the SELECT above
+            pending, self._pending = self._pending, {}
+            for customer_id, customer in pending.items():
+                self._remove(customer_id)
+                if customer is not None:
+                    self._insert(customer)
+
+    def load_in_background(self, app):
+        """Start loading the index in a daemon thread unless it is loaded or already loading"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded or self._loading:
+                return
+            self._loading = True
+        threading.Thread(target=self._load_in_app_context, args=(app,), daemon=True).start()
+
+    def _load_in_app_context(self, app):
+        try:
+            with app.app_context():
+                cursor = mysql.connection.cursor()
+                try:
+                    self.load(cursor)
+                finally:
+                    cursor.close()
+        except Exception:
+            # The next search starts another attempt
+            app.logger.exception('Customer search index load failed')
+        finally:
+            self._loading = False
+
+    def add(self, customer):
+        """Insert or replace a customer after registration or an edit"""
+        with self._lock:
+            if not self._loaded:
+                self._pending[customer['CustomerID']] = customer
+                return
+            self._remove(customer['CustomerID'])
+            self._insert(customer)
+
+    def remove(self, customer_id):
+        """Drop a customer from the index"""
+        with self._lock:
+            if not self._loaded:
+                self._pending[customer_id] = None
+                return
+            self._remove(customer_id)
+
+    def _insert(self, customer):
+        self._customers[customer['CustomerID']] = customer
+        for key in self._keys_for(customer):
+            bisect.insort(self._entries, (key, customer['CustomerID']))
+
+    def _remove(self, customer_id):
+        customer = self._customers.pop(customer_id, None)
+        if customer is None:
+            return
+        for key in self._keys_for(customer):
+            pos = bisect.bisect_left(self._entries, (key, customer_id))
+            if pos < len(self._entries) and self._entries[pos] == (key, customer_id):
+                del self._entries[pos]
+
+    def _scan(self, prefix, limit, found):
+        pos = bisect.bisect_left(self._entries, (prefix,))
+        while pos < len(self._entries) and len(found) < limit:
+            key, customer_id = self._entries[pos]
+            if not key.startswith(prefix):
+                break
+            if customer_id not in found:
+                found[customer_id] = self._customers[customer_id]
+            pos += 1
+
+    def search(self, query, limit=10):
+        """Return up to `limit` customers with a name, email or phone starting with `query`"""
+        text = self._normalize(query)
+        digits = self._digits(query)
+        found = {}
+        if not text:
+            return []
+        # Cheap reads: the lock only guards against a concurrent insort/del
+        with self._lock:
+            self._scan(text, limit, found)
+            if digits and digits != text:
+                self._scan(digits, limit, found)
+        return list(found.values())
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+customer_index = CustomerSearchIndex()
+
+@app.before_request
+def start_customer_index_load():
+    """Load the customer index in the serving process only (not the CLI or the reloader watcher)"""
+    customer_index.load_in_background(app)
+
+# Menu Rotation Resolver
+MENU_SNAPSHOT_MAX_AGE = timedelta(minutes=5)
+
+class MenuRotationResolver:
+    """Precomputes the customer menu for the active rotation(s) and swaps it in at rotation boundaries"""
+
+    def __init__(self, app):
+        self._app = app
+        self._lock = threading.Lock()
+        self._state = None  # (categorized_menu, valid_until), always replaced as a whole
+        self._timer = None
+
+    def _build(self, cursor, now):
+        today = now.date()
+        # A rotation is active from the start of StartDate through the end of EndDate
+        cursor.execute("""
+            SELECT RotationID, EndDate
+            FROM MenuRotation
+            WHERE StartDate <= %s AND EndDate >= %s
+        """, (today, today))
+        active = cursor.fetchall()
+
+        if active:
+            rotation_ids = [rotation['RotationID'] for rotation in active]
+            placeholders = ', '.join(['%s'] * len(rotation_ids))
+            cursor.execute(f"""
+                SELECT DISTINCT m.*
+                FROM MenuItem m
+                JOIN MenuRotationItem mri ON mri.ItemID = m.ItemID
+                WHERE mri.RotationID IN ({placeholders}) AND m.IsAvailable = 1
+                ORDER BY m.Category, m.Name
+            """, rotation_ids)
+        else:
+            # No rotation scheduled today, serve the full menu
+            cursor.execute("SELECT * FROM MenuItem WHERE IsAvailable = 1 ORDER BY Category, Name")
+        menu_items = cursor.fetchall()
+
+        categorized_menu = {}
+        for item in menu_items:
+            categorized_menu.setdefault(item['Category'], []).append(item)
+
+        # Next boundary: the day after an active rotation ends, or the next rotation start
+        cursor.execute("SELECT MIN(StartDate) AS NextStart FROM MenuRotation WHERE StartDate > %s", (today,))
+        next_start = cursor.fetchone()['NextStart']
+        boundaries = [rotation['EndDate'] + timedelta(days=1) for rotation in active]
+        if next_start:
+            boundaries.append(next_start)
+        # Also expire after a few minutes so edits made outside this app (e.g. the
+        # UpdateMenuPrice procedure) still reach customers
+        valid_until = now + MENU_SNAPSHOT_MAX_AGE
+        if boundaries:
+            valid_until = min(valid_until, datetime.combine(min(boundaries), datetime.min.time()))
+
+        return categorized_menu, valid_until
+
+    def refresh(self, cursor, force=True):
+        """Recompute the active menu and reschedule the next boundary swap.
+
+        With force=False the rebuild is skipped if another thread already
+        replaced a stale snapshot while this one waited for the lock.
+        """
+        with self._lock:
+            if not force and self._state is not None and datetime.now() < self._state[1]:
+                return
+            self._state = self._build(cursor, datetime.now())
+            if self._timer:
+                self._timer.cancel()
+            delay = max((self._state[1] - datetime.now()).total_seconds(), 0)
+            self._timer = threading.Timer(delay, self._on_boundary)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def rebuild(self):
+        """Recompute the active menu on a new cursor, logging instead of raising on failure"""
+        try:
+            cursor = mysql.connection.cursor()
+            try:
+                self.refresh(cursor)
+            finally:
+                cursor.close()
+        except Exception:
+            # Drop the snapshot so get_menu() rebuilds it on the next request
+            self._state = None
+            self._app.logger.exception('Menu rotation refresh failed')
+
+    def _on_boundary(self):
+        with self._app.app_context():
+            self.rebuild()
+
+    def get_menu(self):
+        """Return the precomputed categorized menu, building it if missing or stale"""
+        state = self._state
+        if state is None or datetime.now() >= state[1]:
+            cursor = mysql.connection.cursor()
+            try:
+                self.refresh(cursor, force=False)
+            finally:
+                cursor.close()
+            state = self._state
+        return state[0]
+
+menu_rotation = MenuRotationResolver(app)
+
+# Transaction Export
+EXPORT_FETCH_ROWS = 1000
+# Seconds MySQL waits on a slow download before dropping a streaming export (server default is 60)
+EXPORT_NET_WRITE_TIMEOUT = 3600
+
+TRANSACTION_EXPORTS = {
+    'payments': {
+        'columns': ['PaymentID', 'OrderID', 'Amount', 'PaymentMethod', 'PaymentDateTime', 'AuthCode', 'Status'],
+        'day': 'PaymentDateTime',
+        'amount': lambda row: row['Amount'],
+        'query': """
+            SELECT PaymentID, OrderID, Amount, PaymentMethod, PaymentDateTime, AuthCode, Status
+            FROM Payment
+            WHERE PaymentDateTime >= %s AND PaymentDateTime < %s AND PaymentID > %s
+            ORDER BY PaymentID
+        """,
+    },
+    'order-lines': {
+        'columns': ['OrderItemID', 'OrderID', 'OrderDateTime', 'OrderStatus', 'ItemID', 'Quantity', 'UnitPriceAtOrder'],
+        'day': 'OrderDateTime',
+        'amount': lambda row: row['Quantity'] * row['UnitPriceAtOrder'],
+        'query': """
+            SELECT oi.OrderItemID, oi.OrderID, o.OrderDateTime, o.Status AS OrderStatus,
+                   oi.ItemID, oi.Quantity, oi.UnitPriceAtOrder
+            FROM OrderItem oi
+            JOIN SalesOrder o ON oi.OrderID = o.OrderID
+            WHERE o.OrderDateTime >= %s AND o.OrderDateTime < %s AND oi.OrderItemID > %s
+            ORDER BY oi.OrderItemID
+        """,
+    },
+}
+
+def iter_export_rows(kind, start_date, end_date, after=0, limit=None):
+    """Yield export rows in ID order through an unbuffered server-side cursor"""
+    query = TRANSACTION_EXPORTS[kind]['query']
+    if limit:
+        query += f" LIMIT {int(limit)}"
+
+    cursor = mysql.connection.cursor(MySQLdb.cursors.SSDictCursor)
+    try:
+        # Rows are only read as fast as the client downloads them
+        cursor.execute("SET SESSION net_write_timeout = %s", (EXPORT_NET_WRITE_TIMEOUT,))
+        cursor.execute(query, (start_date, end_date, after))
+        while True:
+            rows = cursor.fetchmany(EXPORT_FETCH_ROWS)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+def iter_export_csv_gz(kind, start_date, end_date, after=0, limit=None):
+    """Yield a gzip CSV export piece by piece; each call produces a standalone .csv.gz file"""
+    compressor = zlib.compressobj(wbits=31)  # wbits=31 writes a gzip container
+    columns = TRANSACTION_EXPORTS[kind]['columns']
+    pending = [_csv_line(columns)]
+    for row in iter_export_rows(kind, start_date, end_date, after, limit):
+        pending.append(_csv_line([row[column] for column in columns]))
+        if len(pending) >= EXPORT_FETCH_ROWS:
+            data = compressor.compress(''.join(pending).encode('utf-8'))
+            pending = []
+            if data:
+                yield data
+    yield compressor.compress(''.join(pending).encode('utf-8')) + compressor.flush()
+
+def export_day_summary(kind, start_date, end_date):
+    """Row count, amount total and SHA-256 of the exported CSV lines for each day.
+
+    Scans the whole range in one pass, so it is only exposed through the
+    export-transactions CLI rather than a web request.
+    """
+    export = TRANSACTION_EXPORTS[kind]
+    days = {}
+    for row in iter_export_rows(kind, start_date, end_date):
+        day = row[export['day']].date().isoformat()
+        if day not in days:
+            days[day] = {'rows': 0, 'amount': Decimal('0'), 'sha256': hashlib.sha256()}
+        days[day]['rows'] += 1
+        days[day]['amount'] += export['amount'](row)
+        # Lines are hashed in ID order, matching their order in the export file
+        line = _csv_line([row[column] for column in export['columns']])
+        days[day]['sha256'].update(line.encode('utf-8'))
+
+    return [{'date': day, 'rows': days[day]['rows'], 'amount': str(days[day]['amount']),
+             'sha256': days[day]['sha256'].hexdigest()}
+            for day in sorted(days)]
+
+# Dashboard Widgets
+class DashboardWidgets:
+    """Runs independent dashboard queries concurrently with per-widget timeouts and a short-TTL cache"""
+
+    def __init__(self, app):
+        self._app = app
+        self._widgets = {}
+        self._cache = {}    # widget name -> (expires at, value)
+        self._running = {}  # widget name -> in-flight future shared by every waiting page view
+        self._lock = threading.Lock()
+        self._connections = queue.Queue()
+
+    def widget(self, name, default, timeout=2.0, ttl=30):
+        """Register a widget query; the function receives a cursor and returns the widget value.
+
+        `default` is rendered in place of the value when the query fails or times out.
+        """
+        def decorator(f):
+            # One worker per widget, so a slow aggregate can never hold up the cheap counts
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'dashboard-{name}')
+            self._widgets[name] = {'query': f, 'default': default, 'timeout': timeout, 'ttl': ttl,
+                                   'executor': executor}
+            return f
+        return decorator
+
+    def _connect(self, timeout):
+        try:
+            connection = self._connections.get_nowait()
+        except queue.Empty:
+            connection = None
+        if connection is not None:
+            try:
+                connection.ping()
+                return connection
+            except MySQLdb.OperationalError:
+                connection.close()
+
+        # Bound connect and reads so an unreachable server can't tie up the executor threads
+        timeout = max(int(math.ceil(timeout)), 1)
+        return MySQLdb.connect(host=self._app.config['MYSQL_HOST'],
+                               port=self._app.config.get('MYSQL_PORT', 3306),
+                               user=self._app.config['MYSQL_USER'],
+                               passwd=self._app.config['MYSQL_PASSWORD'],
+                               db=self._app.config['MYSQL_DB'],
+                               cursorclass=MySQLdb.cursors.DictCursor,
+                               connect_timeout=timeout,
+                               read_timeout=timeout + 1,
+                               autocommit=True)
+
+    def _run(self, name):
+        widget = self._widgets[name]
+        connection = self._connect(widget['timeout'])
+        try:
+            cursor = connection.cursor()
+            try:
+                # Let MySQL abort the query once nobody is waiting for it
+                cursor.execute("SET SESSION max_execution_time = %s", (int(widget['timeout'] * 1000),))
+                value = widget['query'](cursor)
+            finally:
+                cursor.close()
+        except Exception:
+            connection.close()
+            raise
+        self._connections.put(connection)
+        self._cache[name] = (monotonic() + widget['ttl'], value)
+        return value
+
+    def _submit(self, name):
+        """Return the in-flight future for a widget, starting one only if none is running"""
+        with self._lock:
+            future = self._running.get(name)
+            if future is None:
+                future = self._widgets[name]['executor'].submit(self._run, name)
+                self._running[name] = future
+        # Added outside the lock: the callback runs immediately if the future is already done
+        future.add_done_callback(lambda done: self._finished(name, done))
+        return future
+
+    def _finished(self, name, future):
+        with self._lock:
+            if self._running.get(name) is future:
+                del self._running[name]
+
+    def load(self, *names):
+        """Return ({name: value}, [unavailable names]); failed or timed-out widgets get their default"""
+        results = {}
+        unavailable = []
+        pending = {}
+        started = monotonic()
+        for name in names:
+            cached = self._cache.get(name)
+            if cached and cached[0] > started:
+                results[name] = cached[1]
+            else:
+                pending[name] = self._submit(name)
+
+        for name, future in pending.items():
+            remaining = started + self._widgets[name]['timeout'] - monotonic()
+            try:
+                results[name] = future.result(timeout=max(remaining, 0))
+            except (FutureTimeoutError, CancelledError):
+                # Drops the job if it never started; a running query is stopped by max_execution_time
+                future.cancel()
+                self._app.logger.warning('Dashboard widget %s timed out', name)
+                results[name] = self._widgets[name]['default']
+                unavailable.append(name)
+            except Exception:
+                self._app.logger.exception('Dashboard widget %s failed', name)
+                results[name] = self._widgets[name]['default']
+                unavailable.append(name)
+        return results, unavailable
+
+dashboard_widgets = DashboardWidgets(app)
+
+@dashboard_widgets.widget('today_reservations', default=0)
+def _today_reservations_widget(cursor):
+    cursor.execute("""
+        SELECT COUNT(*) as count 
+        FROM Reservation 
+        WHERE DATE(StartDateTime) = CURDATE()
+    """)
+    return cursor.fetchone()['count']
+
+@dashboard_widgets.widget('today_orders', default=0)
+def _today_orders_widget(cursor):
+    cursor.execute("""
+        SELECT COUNT(*) as count 
+        FROM SalesOrder 
+        WHERE DATE(OrderDateTime) = CURDATE()
+    """)
+    return cursor.fetchone()['count']
+
+@dashboard_widgets.widget('today_revenue', default=0)
+def _today_revenue_widget(cursor):
+    cursor.execute("""
+        SELECT COALESCE(SUM(Amount), 0) as revenue 
+        FROM Payment 
+        WHERE DATE(PaymentDateTime) = CURDATE()
+        AND Status = 'Captured'
+    """)
+    return cursor.fetchone()['revenue']
+
+@dashboard_widgets.widget('top_items', default=[], timeout=3.0, ttl=120)
+def _top_items_widget(cursor):
+    cursor.execute("""
+        SELECT m.Name, SUM(oi.Quantity) as TotalSold
+        FROM OrderItem oi
+        JOIN MenuItem m ON oi.ItemID = m.ItemID
+        GROUP BY m.ItemID, m.Name
+        ORDER BY TotalSold DESC
+        LIMIT 5
+    """)
+    return cursor.fetchall()
+
+@dashboard_widgets.widget('daily_revenue', default=[], timeout=5.0, ttl=300)
+def _daily_revenue_widget(cursor):
+    cursor.execute("""
+        SELECT DATE(p.PaymentDateTime) as Date,
+               COUNT(DISTINCT o.OrderID) as Orders,
+               SUM(p.Amount) as Revenue
+        FROM Payment p
+        JOIN SalesOrder o ON p.OrderID = o.OrderID
+        WHERE p.Status = 'Captured'
+        GROUP BY DATE(p.PaymentDateTime)
+        ORDER BY Date DESC
+        LIMIT 30
+    """)
+    return cursor.fetchall()
+
+@dashboard_widgets.widget('staff_performance', default=[], timeout=5.0, ttl=300)
+def _staff_performance_widget(cursor):
+    cursor.execute("""
+        SELECT CONCAT(s.FirstName, ' ', s.LastName) as StaffName,
+               COUNT(DISTINCT o.OrderID) as OrdersHandled,
+               COALESCE(SUM(oi.Quantity * oi.UnitPriceAtOrder), 0) as TotalSales
+        FROM Staff s
+        LEFT JOIN SalesOrder o ON o.StaffID = s.StaffID
+        LEFT JOIN OrderItem oi ON oi.OrderID = o.OrderID
+        GROUP BY s.StaffID, s.FirstName, s.LastName
+        ORDER BY TotalSales DESC
+    """)
+    return cursor.fetchall()
+
 # Routes
 @app.route('/')
 def index():
@@ -113,6 +644,8 @@ def register():
             cursor.execute("INSERT INTO Customer (FirstName, LastName, Email, Phone) VALUES (%s, %s, %s, %s)",
                            (first_name, last_name, email, phone))
             mysql.connection.commit()
+            customer_index.add({'CustomerID': cursor.lastrowid, 'FirstName': first_name,
+                                'LastName': last_name, 'Phone': phone, 'Email': email})
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('login'))
         except Exception as e:
@@ -251,18 +784,8 @@ def customer_menu():
     if session.get('user_role') != 'customer':
         return redirect(url_for('index'))
     
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT * FROM MenuItem WHERE IsAvailable = 1 ORDER BY Category, Name")
-    menu_items = cursor.fetchall()
-    cursor.close()
-    
-    # Group menu items by category
-    categorized_menu = {}
-    for item in menu_items:
-        category = item['Category']
-        if category not in categorized_menu:
-            categorized_menu[category] = []
-        categorized_menu[category].append(item)
+    # Menu for the active rotation(s), grouped by category
+    categorized_menu = menu_rotation.get_menu()
     
     return render_template('customer/menu.html', categorized_menu=categorized_menu)
 
@@ -429,6 +952,26 @@ def staff_reservations():
     
     return render_template('staff_reservations.html', reservations=reservations)
 
+@app.route('/staff/customers/search')
+@login_required
+@staff_required
+def staff_customer_search():
+    """Type-ahead customer lookup by name, phone or email (JSON)"""
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+
+    if not customer_index.loaded:
+        # Still loading, or the load failed and is retried by the next request
+        return jsonify({'status': 'loading', 'message': 'Customer search is starting up, please try again shortly.',
+                        'results': []}), 503
+
+    results = customer_index.search(query, limit)
+    return jsonify({'status': 'success', 'results': [
+        {'customer_id': c['CustomerID'], 'first_name': c['FirstName'], 'last_name': c['LastName'],
+         'phone': c['Phone'], 'email': c['Email']}
+        for c in results
+    ]})
+
 @app.route('/staff/update-reservation/<int:reservation_id>', methods=['POST'])
 @login_required
 @staff_required
@@ -551,49 +1094,16 @@ def process_payment(order_id):
 @admin_required
 def admin_dashboard():
     """Admin dashboard with reports"""
-    cursor = mysql.connection.cursor()
-    
-    # Today's stats
-    cursor.execute("""
-        SELECT COUNT(*) as count 
-        FROM Reservation 
-        WHERE DATE(StartDateTime) = CURDATE()
-    """)
-    today_reservations = cursor.fetchone()['count']
-    
-    cursor.execute("""
-        SELECT COUNT(*) as count 
-        FROM SalesOrder 
-        WHERE DATE(OrderDateTime) = CURDATE()
-    """)
-    today_orders = cursor.fetchone()['count']
-    
-    cursor.execute("""
-        SELECT COALESCE(SUM(Amount), 0) as revenue 
-        FROM Payment 
-        WHERE DATE(PaymentDateTime) = CURDATE()
-        AND Status = 'Captured'
-    """)
-    today_revenue = cursor.fetchone()['revenue']
-    
-    # Top menu items
-    cursor.execute("""
-        SELECT m.Name, SUM(oi.Quantity) as TotalSold
-        FROM OrderItem oi
-        JOIN MenuItem m ON oi.ItemID = m.ItemID
-        GROUP BY m.ItemID, m.Name
-        ORDER BY TotalSold DESC
-        LIMIT 5
-    """)
-    top_items = cursor.fetchall()
-    
-    cursor.close()
+    # Today's stats and top menu items, loaded concurrently
+    widgets, unavailable_widgets = dashboard_widgets.load('today_reservations', 'today_orders',
+                                                          'today_revenue', 'top_items')
     
     return render_template('admin_dashboard.html',
-                         today_reservations=today_reservations,
-                         today_orders=today_orders,
-                         today_revenue=today_revenue,
-                         top_items=top_items)
+                         today_reservations=widgets['today_reservations'],
+                         today_orders=widgets['today_orders'],
+                         today_revenue=widgets['today_revenue'],
+                         top_items=widgets['top_items'],
+                         unavailable_widgets=unavailable_widgets)
 
 @app.route('/admin/menu')
 @login_required
@@ -603,9 +1113,17 @@ def admin_menu():
     cursor = mysql.connection.cursor()
     cursor.execute("SELECT * FROM MenuItem ORDER BY Category, Name")
     menu_items = cursor.fetchall()
+    cursor.execute("""
+        SELECT r.RotationID, r.Label, r.StartDate, r.EndDate, COUNT(mri.ItemID) as ItemCount
+        FROM MenuRotation r
+        LEFT JOIN MenuRotationItem mri ON mri.RotationID = r.RotationID
+        GROUP BY r.RotationID, r.Label, r.StartDate, r.EndDate
+        ORDER BY r.StartDate DESC
+    """)
+    rotations = cursor.fetchall()
     cursor.close()
     
-    return render_template('admin_menu.html', menu_items=menu_items)
+    return render_template('admin_menu.html', menu_items=menu_items, rotations=rotations)
 
 @app.route('/admin/menu/add', methods=['POST'])
 @login_required
@@ -630,6 +1148,9 @@ def add_menu_item():
     finally:
         cursor.close()
     
+    # Pick up the change in the customer menu
+    menu_rotation.rebuild()
+    
     return redirect(url_for('admin_menu'))
 
 @app.route('/admin/menu/update/<int:item_id>', methods=['POST'])
@@ -655,6 +1176,65 @@ def update_menu_item(item_id):
     finally:
         cursor.close()
     
+    # Pick up the change in the customer menu
+    menu_rotation.rebuild()
+    
+    return redirect(url_for('admin_menu'))
+
+@app.route('/admin/menu/rotations/add', methods=['POST'])
+@login_required
+@admin_required
+def add_menu_rotation():
+    """Add a menu rotation"""
+    label = request.form.get('label')
+    start_date = request.form.get('start_date')
+    end_date = request.form.get('end_date')
+    item_ids = request.form.getlist('items[]')
+    
+    cursor = mysql.connection.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO MenuRotation (StartDate, EndDate, Label)
+            VALUES (%s, %s, %s)
+        """, (start_date, end_date, label))
+        rotation_id = cursor.lastrowid
+        for item_id in item_ids:
+            cursor.execute("""
+                INSERT INTO MenuRotationItem (RotationID, ItemID)
+                VALUES (%s, %s)
+            """, (rotation_id, item_id))
+        mysql.connection.commit()
+        flash('Menu rotation added successfully!', 'success')
+    except Exception as e:
+        mysql.connection.rollback()
+        flash(f'Error adding menu rotation: {str(e)}', 'danger')
+    finally:
+        cursor.close()
+    
+    # Pick up the change in the customer menu
+    menu_rotation.rebuild()
+    
+    return redirect(url_for('admin_menu'))
+
+@app.route('/admin/menu/rotations/delete/<int:rotation_id>', methods=['POST'])
+@login_required
+@admin_required
+def delete_menu_rotation(rotation_id):
+    """Delete a menu rotation"""
+    cursor = mysql.connection.cursor()
+    try:
+        cursor.execute("DELETE FROM MenuRotation WHERE RotationID = %s", (rotation_id,))
+        mysql.connection.commit()
+        flash('Menu rotation deleted successfully!', 'success')
+    except Exception as e:
+        mysql.connection.rollback()
+        flash(f'Error deleting menu rotation: {str(e)}', 'danger')
+    finally:
+        cursor.close()
+    
+    # Pick up the change in the customer menu
+    menu_rotation.rebuild()
+    
     return redirect(url_for('admin_menu'))
 
 @app.route('/admin/staff')
@@ -674,40 +1254,84 @@ def admin_staff():
 @admin_required
 def admin_reports():
     """View reports"""
-    cursor = mysql.connection.cursor()
-    
-    # Daily revenue report
-    cursor.execute("""
-        SELECT DATE(p.PaymentDateTime) as Date,
-               COUNT(DISTINCT o.OrderID) as Orders,
-               SUM(p.Amount) as Revenue
-        FROM Payment p
-        JOIN SalesOrder o ON p.OrderID = o.OrderID
-        WHERE p.Status = 'Captured'
-        GROUP BY DATE(p.PaymentDateTime)
-        ORDER BY Date DESC
-        LIMIT 30
-    """)
-    daily_revenue = cursor.fetchall()
-    
-    # Staff performance
-    cursor.execute("""
-        SELECT CONCAT(s.FirstName, ' ', s.LastName) as StaffName,
-               COUNT(DISTINCT o.OrderID) as OrdersHandled,
-               COALESCE(SUM(oi.Quantity * oi.UnitPriceAtOrder), 0) as TotalSales
-        FROM Staff s
-        LEFT JOIN SalesOrder o ON o.StaffID = s.StaffID
-        LEFT JOIN OrderItem oi ON oi.OrderID = o.OrderID
-        GROUP BY s.StaffID, s.FirstName, s.LastName
-        ORDER BY TotalSales DESC
-    """)
-    staff_performance = cursor.fetchall()
-    
-    cursor.close()
+    # Daily revenue report and staff performance, loaded concurrently
+    widgets, unavailable_widgets = dashboard_widgets.load('daily_revenue', 'staff_performance')
     
     return render_template('admin_reports.html',
-                         daily_revenue=daily_revenue,
-                         staff_performance=staff_performance)
+                         daily_revenue=widgets['daily_revenue'],
+                         staff_performance=widgets['staff_performance'],
+                         unavailable_widgets=unavailable_widgets)
+
+#  ACCOUNTING EXPORT
+
+def _export_request_args(kind):
+    """Validate export query parameters; start is inclusive, end is exclusive"""
+    if kind not in TRANSACTION_EXPORTS:
+        raise ValueError(f'Unknown export: {kind}')
+    try:
+        start_date = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('start and end must be dates in YYYY-MM-DD format')
+    if end_date <= start_date:
+        raise ValueError('end must be after start')
+
+    try:
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        after = -1
+    if after < 0:
+        raise ValueError('after must be a non-negative row ID')
+
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValueError('limit must be a positive integer')
+    return start_date, end_date, after, limit
+
+@app.route('/admin/export/<kind>')
+@login_required
+@admin_required
+def export_transactions(kind):
+    """Stream payments or order lines as gzip CSV.
+
+    Pass `limit` to download in chunks and `after` (the last ID received,
+    the first CSV column) to resume from where a previous chunk ended.
+    """
+    try:
+        start_date, end_date, after, limit = _export_request_args(kind)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    filename = f"{kind}_{start_date}_{end_date}" + (f"_after{after}" if after else '') + '.csv.gz'
+    return Response(stream_with_context(iter_export_csv_gz(kind, start_date, end_date, after, limit)),
+                    mimetype='application/gzip',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.cli.command('export-transactions')
+@click.argument('kind', type=click.Choice(list(TRANSACTION_EXPORTS)))
+@click.option('--start', required=True, type=click.DateTime(formats=['%Y-%m-%d']), help='First day to export.')
+@click.option('--end', required=True, type=click.DateTime(formats=['%Y-%m-%d']), help='Day after the last day to export.')
+@click.option('--after', default=0, type=click.IntRange(min=0), help='Resume after this row ID.')
+@click.option('--limit', default=None, type=click.IntRange(min=1), help='Maximum number of rows to export.')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Output file (default: <kind>_<start>_<end>.csv.gz).')
+@click.option('--summary', is_flag=True, help='Print the per-day checksum summary instead of exporting.')
+def export_transactions_command(kind, start, end, after, limit, output, summary):
+    """Export payments or order lines as gzip CSV"""
+    start_date, end_date = start.date(), end.date()
+    if summary:
+        click.echo(json.dumps(export_day_summary(kind, start_date, end_date), indent=2))
+        return
+
+    output = output or f"{kind}_{start_date}_{end_date}.csv.gz"
+    with open(output, 'wb') as f:
+        for data in iter_export_csv_gz(kind, start_date, end_date, after, limit):
+            f.write(data)
+    click.echo(f'Wrote {output}')
 
 #  ERROR HANDLERS 
 